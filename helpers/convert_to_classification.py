@@ -17,54 +17,142 @@ Behavior:
 """
 
 import argparse
+import errno
 import os
 import shutil
 import random
+import sys
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+SEP = os.sep
 
 IMG_EXTS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'}
+# same extensions as a tuple, so a single str.endswith() can test a file name
+IMG_EXT_TUPLE = tuple(IMG_EXTS)
 
-def find_image_for_label(label_path, images_dir):
-    base = os.path.splitext(os.path.basename(label_path))[0]
-    # direct extensions check
-    for ext in IMG_EXTS:
-        cand = os.path.join(images_dir, base + ext)
-        if os.path.isfile(cand):
-            return cand
-    # recursive search (useful if images are in subfolders)
-    for root, _, files in os.walk(images_dir):
-        for f in files:
-            name, ext = os.path.splitext(f)
-            if name == base and ext.lower() in IMG_EXTS:
-                return os.path.join(root, f)
-    return None
-
-def parse_label_file(label_path):
-    class_ids = []
-    with open(label_path, 'r', encoding='utf-8') as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split()
-            class_ids.append(parts[0])
-    return class_ids
+# file names taken in each destination folder (existing on disk or already assigned),
+# stored as name_key(name)
+used_dests = {}
+
+# file name comparison key following the filesystem's case rules: macOS and Windows
+# volumes are case-insensitive by default, so IMG.jpg and img.jpg are the same file there
+if sys.platform in ('darwin', 'win32'):
+    def name_key(name):
+        return name.casefold()
+else:
+    name_key = os.path.normcase
+
+def build_image_index(images_dir):
+    """
+    Walks images_dir once (os.scandir, recursive) and returns a dict mapping
+    image basename without extension -> full path. Images directly in
+    images_dir take precedence over ones found in subfolders.
+    """
+    index = {}
+    stack = [images_dir]
+    while stack:
+        d = stack.pop()
+        with os.scandir(d) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(IMG_EXT_TUPLE) and entry.is_file():
+                    index.setdefault(entry.name.rsplit('.', 1)[0], entry.path)
+    return index
+
+def iter_labels(labels_dir):
+    """
+    Yields the os.DirEntry of every .txt file under labels_dir (recursive, os.scandir
+    based). Entries can be opened directly and expose .name/.path without a join.
+    """
+    stack = [labels_dir]
+    while stack:
+        d = stack.pop()
+        with os.scandir(d) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith('.txt'):
+                    yield entry
+
+def scan_dataset(dataset_dir):
+    """
+    For flat layouts where images and their .txt labels share one folder: builds
+    the image index and the label file list in a single walk, instead of listing
+    the same folders twice. Returns (image_index, label_files) as
+    build_image_index / iter_labels would.
+    """
+    image_index = {}
+    label_files = []
+    stack = [dataset_dir]
+    while stack:
+        d = stack.pop()
+        with os.scandir(d) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith('.txt'):
+                    label_files.append(entry)
+                elif entry.name.lower().endswith(IMG_EXT_TUPLE) and entry.is_file():
+                    image_index.setdefault(entry.name.rsplit('.', 1)[0], entry.path)
+    return image_index, label_files
+
+def parse_label_first_and_multi(label_path):
+    """
+    Returns (first class id token as raw bytes or None if the file is empty,
+    whether the file has more than one label line). Stops reading at the second
+    label line, since nothing past it is ever used; a file with hundreds of
+    detections costs the same as a single-box one.
+    """
+    first = None
+    with open(label_path, 'rb') as fh:
+        for chunk in fh:
+            # binary iteration only splits on b'\n'; splitlines() also breaks on a
+            # bare b'\r', like the text-mode universal newlines did
+            for line in chunk.splitlines():
+                parts = line.split(None, 1)
+                if not parts:
+                    continue
+                if first is not None:
+                    return first, True
+                first = parts[0]
+    return first, False
 
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
-def copy_image_to(output_dir, split, class_name, image_path, move=False):
-    dest_dir = os.path.join(output_dir, split, class_name)
-    ensure_dir(dest_dir)
-    dest_path = os.path.join(dest_dir, os.path.basename(image_path))
-    if os.path.exists(dest_path):
-        name, ext = os.path.splitext(os.path.basename(image_path))
+def resolve_dest_path(dest_dir, image_path):
+    """
+    Picks a free destination path for image_path inside dest_dir (an
+    output_dir/split/class_name folder), adding a numeric suffix on name collisions.
+    The folder must already exist; it is listed once on first use, after that
+    collisions are checked against used_dests only.
+    """
+    used = used_dests.get(dest_dir)
+    if used is None:
+        with os.scandir(dest_dir) as it:
+            used = used_dests[dest_dir] = {name_key(entry.name) for entry in it}
+    dest_name = os.path.basename(image_path)
+    if name_key(dest_name) in used:
+        name, ext = os.path.splitext(dest_name)
         i = 1
-        while os.path.exists(dest_path):
-            dest_path = os.path.join(dest_dir, f"{name}_{i}{ext}")
+        while name_key(dest_name) in used:
+            dest_name = f"{name}_{i}{ext}"
             i += 1
+    used.add(name_key(dest_name))
+    return f"{dest_dir}{SEP}{dest_name}"
+
+def copy_image_to(image_path, dest_path, move=False):
     if move:
-        shutil.move(image_path, dest_path)
+        # a plain rename never touches the file contents; shutil.move handles
+        # the cross-device case (including bind mounts of the same filesystem)
+        try:
+            os.rename(image_path, dest_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(image_path, dest_path)
     else:
         shutil.copy2(image_path, dest_path)
     return dest_path
@@ -101,8 +189,10 @@ def load_classes_from_yaml(path):
         yaml = None
 
     if yaml is not None:
+        # libyaml-backed loader when PyYAML was built with it, pure-Python otherwise
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
         with open(path, 'r', encoding='utf-8') as fh:
-            parsed = yaml.safe_load(fh)
+            parsed = yaml.load(fh, Loader=loader)
         if not parsed:
             return {}
         names = parsed.get('names', None)
@@ -195,86 +285,129 @@ def main(args):
     else:
         print("No class mapping found — numeric class IDs will be used as folder names.")
 
-    label_files = []
-    for root, _, files in os.walk(args.labels_dir):
-        for f in files:
-            if f.lower().endswith('.txt'):
-                label_files.append(os.path.join(root, f))
+    images_dir = os.path.normpath(args.images_dir)
+    labels_dir = os.path.normpath(args.labels_dir)
+    if images_dir == labels_dir:
+        # images and labels in the same folder: index both in one walk
+        image_index, label_files = scan_dataset(images_dir)
+    else:
+        label_files = list(iter_labels(labels_dir))
+        image_index = build_image_index(images_dir)
 
     print(f"Found {len(label_files)} label files in {args.labels_dir}")
 
-    samples = []
+    # parallel lists (image path, class name) rather than one tuple per sample
+    sample_imgs = []
+    sample_cnames = []
+    # raw class id token (bytes, as read from the label files) -> sanitized,
+    # interned folder name; string names are resolved up front, everything else
+    # (unmapped ids, non-string YAML values like None/bools) on first use
+    resolved_names = {
+        cid.encode('utf-8'): sys.intern(name.replace(' ', '_'))
+        for cid, name in class_map.items() if isinstance(name, str)
+    }
     skipped = 0
     multi = 0
     missing_image = 0
 
-    for lf in label_files:
-        class_ids = parse_label_file(lf)
-        if not class_ids:
+    # label reads are I/O bound, so overlap them in threads; results keep label_files order
+    workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parsed = list(executor.map(parse_label_first_and_multi, label_files))
+
+    for lf, (first_id, is_multi) in zip(label_files, parsed):
+        if first_id is None:
             skipped += 1
             continue
 
-        if len(class_ids) > 1:
+        if is_multi:
             multi += 1
-            if args.force_first:
-                chosen = class_ids[0]
-            else:
+            if not args.force_first:
                 # skip images with multiple labels by default
                 continue
-        else:
-            chosen = class_ids[0]
 
-        img = find_image_for_label(lf, args.images_dir)
+        # label files all end in '.txt', so the stem is the name minus 4 chars
+        img = image_index.get(lf.name[:-4])
         if img is None:
             missing_image += 1
             continue
 
-        # map to name if available
-        class_name = class_map.get(str(chosen), None)
+        class_name = resolved_names.get(first_id)
         if class_name is None:
-            # fallback to numeric id (string)
-            class_name = str(chosen)
-        # sanitize: replace spaces with underscore
-        class_name = class_name.replace(' ', '_')
-        samples.append((img, class_name))
+            chosen = first_id.decode('utf-8')
+            class_name = class_map.get(chosen, None)
+            # no mapping (or a blank YAML entry): fall back to the numeric id
+            class_name = chosen if class_name is None else str(class_name)
+            # sanitize: replace spaces with underscore
+            class_name = resolved_names[first_id] = sys.intern(class_name.replace(' ', '_'))
+        sample_imgs.append(img)
+        sample_cnames.append(class_name)
 
-    print(f"Usable samples: {len(samples)} (skipped empty: {skipped}, skipped multi: {multi if not args.force_first else 0}, missing images: {missing_image})")
+    print(f"Usable samples: {len(sample_imgs)} (skipped empty: {skipped}, skipped multi: {multi if not args.force_first else 0}, missing images: {missing_image})")
 
     # group by class
     by_class = defaultdict(list)
-    for img, cname in samples:
+    for img, cname in zip(sample_imgs, sample_cnames):
         by_class[cname].append(img)
 
-    # create output structure and split per class
-    total_copied = 0
-    for cname, imgs in by_class.items():
-        random.shuffle(imgs)
+    # create output structure and split per class; destinations are resolved
+    # up front so the copies themselves can run concurrently
+    jobs = []
+    stats = []
+    for cname, imgs in sorted(by_class.items()):
+        # only the validation picks need randomness, so draw n_val indices
+        # instead of shuffling the whole class
         n_val = int(len(imgs) * args.val_split)
-        val_imgs = imgs[:n_val]
-        train_imgs = imgs[n_val:]
+        val_idx = random.sample(range(len(imgs)), n_val)
+        val_imgs = [imgs[i] for i in val_idx]
+        if val_idx:
+            val_set = set(val_idx)
+            train_imgs = [im for i, im in enumerate(imgs) if i not in val_set]
+        else:
+            train_imgs = imgs
+        stats.append((cname, len(train_imgs), len(val_imgs)))
+
+        # each class folder is created once here (and only for splits that get
+        # images, so no empty class folders end up in val/)
+        train_dir = f"{args.output_dir}{SEP}train{SEP}{cname}"
+        val_dir = f"{args.output_dir}{SEP}val{SEP}{cname}"
+        if train_imgs:
+            ensure_dir(train_dir)
+        if val_imgs:
+            ensure_dir(val_dir)
 
         for im in train_imgs:
-            copy_image_to(args.output_dir, 'train', cname, im, move=args.move)
-            total_copied += 1
+            jobs.append((im, resolve_dest_path(train_dir, im)))
         for im in val_imgs:
-            copy_image_to(args.output_dir, 'val', cname, im, move=args.move)
+            jobs.append((im, resolve_dest_path(val_dir, im)))
+
+    # progress bar if tqdm is installed; no per-file prints either way
+    try:
+        from tqdm import tqdm
+    except Exception:
+        tqdm = None
+
+    total_copied = 0
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = executor.map(lambda job: copy_image_to(job[0], job[1], move=args.move), jobs)
+        if tqdm is not None:
+            results = tqdm(results, total=len(jobs), desc="Copying" if not args.move else "Moving", unit="img")
+        for _ in results:
             total_copied += 1
 
     # print distribution
-    print("\nClass distribution in output (total, train, val):")
-    for cname, imgs in by_class.items():
-        n_total = len(imgs)
-        n_val = int(n_total * args.val_split)
-        n_train = n_total - n_val
-        print(f"  {cname}: {n_total}, train {n_train}, val {n_val}")
+    out_lines = ["\nClass distribution in output (total, train, val):"]
+    out_lines.extend(f"  {cname}: {n_train + n_val}, train {n_train}, val {n_val}" for cname, n_train, n_val in stats)
+    sys.stdout.write('\n'.join(out_lines) + '\n')
 
     print(f"\nTotal files copied/moved: {total_copied}")
     print(f"Output root: {os.path.abspath(args.output_dir)}")
 
 if __name__ == '__main__':
     p = argparse.ArgumentParser(description="Convert YOLO detection labels -> ImageNet-style classification folders (named classes)")
-    p.add_argument('--images-dir', required=True, help="Path to images folder")
-    p.add_argument('--labels-dir', required=True, help="Path to labels folder (YOLO .txt files)")
+    p.add_argument('--root', required=False, help="Dataset root containing images/ and labels/ (shortcut for --images-dir/--labels-dir)")
+    p.add_argument('--images-dir', required=False, help="Path to images folder (default: <root>/images)")
+    p.add_argument('--labels-dir', required=False, help="Path to labels folder (YOLO .txt files) (default: <root>/labels)")
     p.add_argument('--output-dir', required=True, help="Output root folder (will contain train/val subfolders)")
     p.add_argument('--classes', required=False, help="Optional path to data.yaml or classes.txt to map numeric IDs to names")
     p.add_argument('--val-split', type=float, default=0.2, help="Fraction to reserve for validation (0.0 - 0.5 recommended)")
@@ -283,4 +416,9 @@ if __name__ == '__main__':
                    help="If a label file has multiple class lines, force-assign the first class instead of skipping (use with care)")
     p.add_argument('--seed', type=int, default=42)
     args = p.parse_args()
+    if args.root:
+        args.images_dir = args.images_dir or os.path.join(args.root, 'images')
+        args.labels_dir = args.labels_dir or os.path.join(args.root, 'labels')
+    if not args.images_dir or not args.labels_dir:
+        p.error("--images-dir and --labels-dir are required unless --root is given")
     main(args)